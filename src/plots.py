@@ -1,9 +1,10 @@
 import datetime
+import orjson
+import os
 import pandas as pd
 import sys
 import matplotlib.pyplot as plt  # type: ignore
 import numpy as np
-from typing import List
 
 # CI
 efgreen         = "#005953"
@@ -11,81 +12,133 @@ eflightgreen    = "#69a3a2"
 eflightergreen  = "#a2c5c4"
 eflightestgreen = "#e6efee"
 
+# Static axis furniture, built once at import time rather than on
+# every tripleplot call.
+month_ticks    = [datetime.date(2024, m, 1) for m in range(2, 10)]
+month_labels   = ["Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep"]
+checkin_ticks  = [datetime.date(2024, 9, d) for d in range(17, 23)]
+checkin_labels = ["17th", "18th", "19th", "20th", "21st", "22nd"]
+count_ticks    = [0, 1000, 2000, 3000, 4000, 5000, 6000]
+
+
+def expand_dicts(dicts: list[dict],
+                 keys: list[str],
+                 names: list[str]) -> pd.core.frame.DataFrame:
+    ''' Expand a list of dicts into one int column per key,
+        in a single vectorized pass. Missing keys become zero.
+        int16 is plenty for per-category reg counts and halves the
+        memory traffic of the reductions downstream. '''
+
+    out         = pd.DataFrame(dicts)
+    out         = out.reindex(columns = keys, fill_value = 0).fillna(0)
+    out.columns = names
+    return out.astype(np.int16)
+
+
+def read_cache(filename: str,
+               cachefile: str) -> tuple[pd.core.frame.DataFrame | None, int]:
+    ''' Load the parsed log from its parquet sidecar. Returns the
+        cached DataFrame and the byte offset of the log it covers,
+        or (None, 0) on a cache miss. '''
+
+    metafile = cachefile + ".meta"
+    if not (os.path.exists(cachefile) and os.path.exists(metafile)):
+        return None, 0
+    with open(metafile, "rb") as f:
+        meta = orjson.loads(f.read())
+    offset = meta.get("size", 0)
+    if offset > os.path.getsize(filename):
+        # The log shrank, so it must have been rewritten.
+        # Discard the cache and reparse it fully.
+        return None, 0
+    return pd.read_parquet(cachefile), offset
+
+
+def write_cache(df: pd.core.frame.DataFrame,
+                offset: int,
+                cachefile: str) -> None:
+    ''' Write the parsed log to its parquet sidecar, together with the
+        byte offset of the log it covers. '''
+
+    df.to_parquet(cachefile)
+    with open(cachefile + ".meta", "wb") as f:
+        f.write(orjson.dumps({"size": offset}))
+
+
+def read_parse_input(filename: str = "./data/log.txt",
+                     cachefile: str = "./data/log.cache.parquet") -> pd.core.frame.DataFrame:
+    # Parsing the log is by far the most expensive part of a refresh,
+    # and the log only ever grows. Reuse the parquet sidecar from the
+    # previous run and parse just the lines appended since then.
+    cached, offset = read_cache(filename, cachefile)
+    if cached is not None and offset == os.path.getsize(filename):
+        return cached
 
-def parse_status_dict(status_dict: dict) -> tuple[int, int, int, int]:
-    ''' Parse a single registration status dictionary.
-    Missing values will be set to zero. '''
-
-    new       = status_dict.get("new", 0)
-    approved  = status_dict.get("approved", 0)
-    partially = status_dict.get("partially paid", 0)
-    paid      = status_dict.get("paid", 0)
-    checkedin = status_dict.get("checked in", 0)
-    return (new, approved, partially, paid, checkedin)
-
-
-def parse_sponsor_dict(sponsor_dict: dict) -> tuple[int, int, int]:
-    ''' Parse a single sponsor status dictionary.
-    Missing values will be set to zero. '''
-
-    normal       = sponsor_dict.get("normal", 0)
-    sponsor      = sponsor_dict.get("sponsor", 0)
-    supersponsor = sponsor_dict.get("supersponsor", 0)
-    return (normal, sponsor, supersponsor)
-
-
-def split_tuplecol(df: pd.core.frame.DataFrame,
-                   incol: str,
-                   outcols: List[str]) -> pd.core.frame.DataFrame:
-    ''' Given a column of tuples, make a set of new columns,
-        containing the tuple elements. Drop input column. '''
-
-    # Sanity check: Make sure every element of the input column contains
-    # an iterable with as many elements as we have output columns.
-    if not all(df[incol].apply(len) == len(outcols)):
-        sys.exit(f"split.tuplecol: Malformed entry in column {incol}.")
-    
-    for i, outcol in enumerate(outcols):
-        df[outcol] = [x[i] for x in df[incol]]
-
-    df.drop(columns = [incol], inplace = True)
-    return df
-
-
-def read_parse_input(filename: str = "./data/log.txt") -> pd.core.frame.DataFrame:
     # For now, we only need the time stamp, the total count (for sanity
-    # checks), the reg status and the sponsor category column.
+    # checks), the reg status and the sponsor category column. Stream
+    # the log line by line with orjson and collect just those four
+    # fields, instead of materializing every field via pd.read_json.
+    timestamps:  list[str]  = []
+    totalcounts: list[int]  = []
+    statuses:    list[dict] = []
+    sponsors:    list[dict] = []
     try:
-        df = pd.read_json(filename, lines = True)
-    except ValueError as e:
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                entry = orjson.loads(line)
+                timestamps.append(entry["CurrentDateTimeUtc"])
+                totalcounts.append(entry["TotalCount"])
+                statuses.append(entry["Status"])
+                sponsors.append(entry["Sponsor"])
+            offset = f.tell()
+    except (IOError, orjson.JSONDecodeError, KeyError) as e:
         sys.exit(f"read_parse_input: Error while loading source data: {e}")
-    df = df.loc[:, ["CurrentDateTimeUtc", "TotalCount", "Status", "Sponsor"]]
-    
-    # Parse timestamp column via direct conversion
-    df.CurrentDateTimeUtc = pd.to_datetime(df.CurrentDateTimeUtc)
-    
-    # Parse 'Status' and 'Sponsor' column from dicts to tuples.
-    df.Status  = df.Status.apply(parse_status_dict)
-    df.Sponsor = df.Sponsor.apply(parse_sponsor_dict)
-    
-    # Turn the two tuple columns into sets of individual columns.
-    status_cols  = ["new", "approved", "partial", "paid", "checkedin"]
-    sponsor_cols = ["normal", "sponsor", "supersponsor"]
-    df           = split_tuplecol(df      = df,
-                                  incol   = "Status",
-                                  outcols = status_cols)
-    df           = split_tuplecol(df      = df,
-                                  incol   = "Sponsor",
-                                  outcols = sponsor_cols)
-    
+
+    # Parse timestamp column via direct conversion. The logger writes
+    # ISO-8601, so name the format explicitly to hit the fast C parser
+    # instead of the per-element fallback.
+    df = pd.DataFrame({"CurrentDateTimeUtc": pd.to_datetime(timestamps,
+                                                            format = "ISO8601",
+                                                            utc    = True,
+                                                            cache  = True),
+                       "TotalCount":         np.asarray(totalcounts,
+                                                        dtype = np.int32)})
+
+    # Expand the 'Status' and 'Sponsor' dicts into sets of
+    # individual int columns.
+    status  = expand_dicts(dicts = statuses,
+                           keys  = ["new", "approved", "partially paid",
+                                    "paid", "checked in"],
+                           names = ["new", "approved", "partial",
+                                    "paid", "checkedin"])
+    sponsor = expand_dicts(dicts = sponsors,
+                           keys  = ["normal", "sponsor", "supersponsor"],
+                           names = ["normal", "sponsor", "supersponsor"])
+    df      = pd.concat([df, status, sponsor], axis = 1)
+
+    # Sanity check: The per-status counts must add up to the reported
+    # total in every row. Both the row sum and the comparison run in C;
+    # no check on the sponsor columns, since the endpoint does not
+    # report a sponsor category for every reg.
+    if not np.array_equal(df.TotalCount.to_numpy(),
+                          status.to_numpy().sum(axis = 1)):
+        sys.exit("read_parse_input: Status counts do not add up to TotalCount.")
+
+    if cached is not None:
+        df = pd.concat([cached, df], ignore_index = True)
+    write_cache(df, offset, cachefile)
     return df
 
 
 def read_old_dashboard(filename: str = "./data/dashboard_per_28082023.csv") -> pd.core.frame.DataFrame:
-    df_23 = pd.read_csv(filename)
+    df_23 = pd.read_csv(filename, engine = "pyarrow")
     df_23.columns = ["idx", "date", "total", "unapproved", "approved", "partially_paid", "paid"]
-    df_23.date = [x[:10] for x in df_23.date]
-    df_23.date = pd.to_datetime(df_23.date) + pd.DateOffset(1)
+    # Parse the full ISO timestamp natively and truncate to midnight,
+    # instead of slicing date strings in a Python loop.
+    df_23.date = (pd.to_datetime(df_23.date, format = "ISO8601", utc = True)
+                    .dt.tz_localize(None)
+                    .dt.normalize()) + pd.DateOffset(1)
     df_23.idx -= 4
     return df_23
     
@@ -93,14 +146,13 @@ def read_old_dashboard(filename: str = "./data/dashboard_per_28082023.csv") -> p
 def daywise(df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame:
     ''' Calculate day-wise count'''
 
-    # Working copy
-    out          = df.copy()
+    # Get last count for every day. Group on the normalized timestamp,
+    # which stays on the fast datetime64 path instead of formatting
+    # every row into a date string first.
+    days        = df.CurrentDateTimeUtc.dt.normalize()
+    out         = df.TotalCount.groupby(days).last().reset_index()
+    out.columns = ["Date", "TotalCount"]
 
-    # Get last count for every day
-    out["Date"]  = pd.to_datetime(df['CurrentDateTimeUtc']).dt.strftime('%m/%d/%Y')
-    out          = out.groupby("Date").agg("last").reset_index()
-    out          = out.loc[:, ["Date", "TotalCount"]]
-    
     # Add day index, shifted by offset of three,
     # s.t. day 0 is the day of reg opening
     out["idx"] = np.arange(0, len(out)) - 3
@@ -108,81 +160,144 @@ def daywise(df: pd.core.frame.DataFrame) -> pd.core.frame.DataFrame:
     return out
 
 
+def downsample(df: pd.core.frame.DataFrame,
+               max_points: int = 2000) -> pd.core.frame.DataFrame:
+    ''' Thin a time-ordered DataFrame to at most max_points rows by
+        taking every k-th row. The last row is always kept, so the
+        plotted series ends on the newest log entry. '''
+
+    step = -(-len(df) // max_points)  # ceiling division
+    if step <= 1:
+        return df
+    out = df.iloc[::step]
+    if out.index[-1] != df.index[-1]:
+        out = pd.concat([out, df.iloc[[-1]]])
+    return out
+
+
+def sponsor_bar_svg(nb_normal: int,
+                    nb_spons: int,
+                    nb_super: int,
+                    filename: str = "./out/sponsorbar.svg") -> None:
+    ''' Write the stacked horizontal sponsor bar as three SVG rects
+        directly, without going through matplotlib. Useful for pages
+        that only want the bar, not the whole dashboard figure. '''
+
+    width, height, xmax = 600, 60, 6000
+    scale = width / xmax
+    x     = 0.0
+    rects = []
+    for count, color in ((nb_normal, eflightergreen),
+                         (nb_spons,  eflightgreen),
+                         (nb_super,  efgreen)):
+        w = count * scale
+        rects.append(f'<rect x="{x:.2f}" y="0" width="{w:.2f}" '
+                     f'height="{height}" fill="{color}"/>')
+        x += w
+    svg = (f'<svg xmlns="http://www.w3.org/2000/svg" '
+           f'width="{width}" height="{height}">'
+           + "".join(rects) + '</svg>\n')
+    try:
+        with open(filename, "w") as f:
+            f.write(svg)
+    except IOError as e:
+        sys.exit(f"sponsor_bar_svg: Error opening file: {e}")
+
+
+def style_axis(ax,
+               xlabel: str,
+               ylabel: str,
+               s: int) -> None:
+    ''' Apply the label and tick styling shared by all subplots. '''
+
+    ax.set_xlabel(xlabel   = xlabel,
+                  fontsize = s,
+                  labelpad = 10)
+    ax.set_ylabel(ylabel   = ylabel,
+                  fontsize = s,
+                  labelpad = 10)
+    for axis in ("x", "y"):
+        ax.tick_params(axis      = axis,
+                       which     = "both",
+                       labelsize = s,
+                       pad       = 10)
+
+
+# Figure reused across tripleplot calls. Creating a fresh figure per
+# refresh makes matplotlib accumulate figure managers in long-lived
+# processes; clearing and repopulating one instance avoids that.
+_figure = None
+
+
 def tripleplot(df: pd.core.frame.DataFrame,
                df_last_daywise: pd.core.frame.DataFrame) -> None:
-        
+
     # Prepare figure
-    s = 20
-    fig, axes = plt.subplots(nrows = 2, ncols = 2, figsize = (15,15))
-    plt.subplots_adjust(hspace = .3, wspace=.3)
+    global _figure
+    if _figure is None:
+        _figure = plt.figure(figsize = (15,15))
+    s    = 20
+    fig  = _figure
+    fig.clf()
+    axes = fig.subplots(nrows = 2, ncols = 2)
+    fig.subplots_adjust(hspace = .3, wspace=.3)
     #axes.flat[3].set_visible(False)
 
+    # All "current count" reads below come from the newest log entry.
+    last_row = df.iloc[-1]
+
     #############
     # Left plot #
     #############
 
     ax           = axes.flat[0]
-    df["totals"] = df.new + df.approved + df.partial + df.paid + df.checkedin
-    
-    ax.plot(df.CurrentDateTimeUtc,
-            df.checkedin,
-            c      = efgreen,
-            lw     = 2,
-            marker = "",
-            label  = "Checked in")
-    ax.plot(df.CurrentDateTimeUtc,
-            df.totals,
-            c      = eflightgreen,
-            lw     = 2,
-            marker = "",
-            label  = "Total")
-    ax.plot(df.CurrentDateTimeUtc,
-            df.paid + df.partial + df.checkedin,
-            c      = eflightergreen,
-            lw     = 2,
-            marker = "",
-            label  = "Paid (incl. partial)")
-
-    # x axis
-    ax.set_xlabel(xlabel   = "Time",
-                  fontsize = s,
-                  labelpad = 10)
-    
-    ax.set_xticks([datetime.date(2024, 2, 1),
-                  datetime.date(2024, 3, 1),
-                  datetime.date(2024, 4, 1),
-                  datetime.date(2024, 5, 1),
-                  datetime.date(2024, 6, 1),
-                  datetime.date(2024, 7, 1),
-                  datetime.date(2024, 8, 1),
-                  datetime.date(2024, 9, 1)])
-    ax.set_xticklabels(["Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep"])
-
-    ax.tick_params(axis      = "x",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
-    
+    # One fused row reduction instead of chaining five Series additions,
+    # which would allocate an intermediate Series per +.
+    df["totals"] = df[["new", "approved", "partial",
+                       "paid", "checkedin"]].to_numpy().sum(axis = 1)
+
+    # The overview spans months of minute-resolution samples; at this
+    # figure size anything beyond a couple thousand points per line is
+    # invisible, so thin the series before handing it to matplotlib.
+    dfp = downsample(df)
+
+    ax.plot(dfp.CurrentDateTimeUtc,
+            dfp.checkedin,
+            c          = efgreen,
+            lw         = 2,
+            marker     = "",
+            rasterized = True,
+            label      = "Checked in")
+    ax.plot(dfp.CurrentDateTimeUtc,
+            dfp.totals,
+            c          = eflightgreen,
+            lw         = 2,
+            marker     = "",
+            rasterized = True,
+            label      = "Total")
+    ax.plot(dfp.CurrentDateTimeUtc,
+            dfp.paid + dfp.partial + dfp.checkedin,
+            c          = eflightergreen,
+            lw         = 2,
+            marker     = "",
+            rasterized = True,
+            label      = "Paid (incl. partial)")
+
+    # Axes
+    style_axis(ax, xlabel = "Time", ylabel = "Count", s = s)
+
+    ax.set_xticks(month_ticks)
+    ax.set_xticklabels(month_labels)
     ax.set_xlim([datetime.date(2024, 1, 25),
                  datetime.date(2024, 9, 25)]) # target: 18th Sept (2024, 9, 18)
 
-    # y axis
-    ax.set_ylabel(ylabel = "Count",
-                  fontsize = s,
-                  labelpad = 10)
-    ax.set_yticks([0, 1000, 2000, 3000, 4000, 5000, 6000])
-    ax.hlines(y      = [1000 * i for i in range(50)],
-              xmin   = datetime.date(2024, 1, 1),
-              xmax   = datetime.date(2024, 9, 18),
-              colors = "lightgrey",
-              ls     = "-",
-              lw     = 0.5)
-    ax.tick_params(axis      = "y",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
+    ax.set_yticks(count_ticks)
+    ax.yaxis.grid(True,
+                  color = "lightgrey",
+                  ls    = "-",
+                  lw    = 0.5)
     ax.set_ylim((0, 6000))
-    
+
     # Legend
     ax.legend(loc      = 9,
               fontsize = 15,
@@ -195,9 +310,12 @@ def tripleplot(df: pd.core.frame.DataFrame,
     ##############
 
     ax = axes.flat[1]
-    nb_normal = df.iloc[-1,:].normal
-    nb_spons  = df.iloc[-1,:].sponsor
-    nb_super  = df.iloc[-1,:].supersponsor
+    nb_normal = last_row.normal
+    nb_spons  = last_row.sponsor
+    nb_super  = last_row.supersponsor
+
+    # Also emit the bar as a standalone, matplotlib-free SVG.
+    sponsor_bar_svg(nb_normal, nb_spons, nb_super)
     
     ax.barh(y     = 0,
             width = nb_normal,
@@ -215,18 +333,9 @@ def tripleplot(df: pd.core.frame.DataFrame,
             label = "Supersponsor")
     
     
-    # x axis
-    ax.set_xlabel(xlabel   = "Count",
-                  fontsize = s,
-                  labelpad = 10)
-    ax.tick_params(axis      = "x",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
+    # Axes
+    style_axis(ax, xlabel = "Count", ylabel = "", s = s)
     ax.set_xlim((0,6000))
- 
-    # y axis
-    ax.set_ylabel(ylabel  = "")
     ax.set_ylim((-1.5, 1.5))
     ax.set_yticks([])
     
@@ -262,24 +371,9 @@ def tripleplot(df: pd.core.frame.DataFrame,
     ax.vlines([230], 0, 10000, color = "grey", ls=":", label = "EF 2024 Begins")
 
     
-    # x axis
-    ax.set_xlabel(xlabel   = "Day After Reg Opening",
-                  fontsize = s,
-                  labelpad = 10)
-    ax.tick_params(axis      = "x",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
+    # Axes
+    style_axis(ax, xlabel = "Day After Reg Opening", ylabel = "Total Regs", s = s)
     ax.set_xlim((-5, 250))
- 
-    # y axis
-    ax.set_ylabel(ylabel  = "Total Regs",
-                 fontsize = s,
-                 labelpad = 10)
-    ax.tick_params(axis      = "y",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
     ax.set_ylim((0, 6000))
     
     # Legend
@@ -296,47 +390,25 @@ def tripleplot(df: pd.core.frame.DataFrame,
     
     ax.plot(df.CurrentDateTimeUtc,
             df.checkedin,
-            c      = efgreen,
-            lw     = 2,
-            marker = "",
-            label  = "Checked in")
+            c          = efgreen,
+            lw         = 2,
+            marker     = "",
+            rasterized = True,
+            label      = "Checked in")
 
-    # x axis
-    ax.set_xlabel(xlabel   = "Date",
-                  fontsize = s,
-                  labelpad = 10)
-    
-    ax.set_xticks([datetime.date(2024, 9, 17),
-                  datetime.date(2024, 9, 18),
-                  datetime.date(2024, 9, 19),
-                  datetime.date(2024, 9, 20),
-                  datetime.date(2024, 9, 21),
-                  datetime.date(2024, 9, 22)])
-    ax.set_xticklabels(["17th", "18th", "19th", "20th", "21st", "22nd"])
-
-    ax.tick_params(axis      = "x",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
-    
+    # Axes
+    style_axis(ax, xlabel = "Date", ylabel = "Checked In", s = s)
+
+    ax.set_xticks(checkin_ticks)
+    ax.set_xticklabels(checkin_labels)
     ax.set_xlim([datetime.date(2024, 9, 17),
                  datetime.date(2024, 9, 22)])
 
-    # y axis
-    ax.set_ylabel(ylabel = "Checked In",
-                  fontsize = s,
-                  labelpad = 10)
-    ax.set_yticks([0, 1000, 2000, 3000, 4000, 5000, 6000])
-    ax.hlines(y      = [1000 * i for i in range(50)],
-              xmin   = datetime.date(2024, 9, 16),
-              xmax   = datetime.date(2024, 9, 22),
-              colors = "lightgrey",
-              ls     = "-",
-              lw     = 0.5)
-    ax.tick_params(axis      = "y",
-                   which     = "both",
-                   labelsize = s,
-                   pad       = 10)
+    ax.set_yticks(count_ticks)
+    ax.yaxis.grid(True,
+                  color = "lightgrey",
+                  ls    = "-",
+                  lw    = 0.5)
     ax.set_ylim((0, 6000))
 
     # Another y axis
@@ -358,9 +430,10 @@ def tripleplot(df: pd.core.frame.DataFrame,
     df.checkinrate    = df.delta_checkins / df.delta_min
     ax2.plot(df.CurrentDateTimeUtc,
             df.checkinrate,
-            c      = "C0",
-            lw     = 2,
-            marker = "")
+            c          = "C0",
+            lw         = 2,
+            marker     = "",
+            rasterized = True)
 
 
                    
@@ -370,7 +443,7 @@ def tripleplot(df: pd.core.frame.DataFrame,
     # Annotations #
     ###############
     
-    last     = str(df.CurrentDateTimeUtc.tolist()[-1]).split(".")[0]
+    last     = str(last_row.CurrentDateTimeUtc).split(".")[0]
  
     annot    = \
 f'''Last update {last} (UTC).
@@ -380,11 +453,11 @@ For questions, contact @GermanCoyote.'''
                 xycoords = 'figure fraction',
                 fontsize = s/3)
 
-    new       = df.new.tolist()[-1]
-    approved  = df.approved.tolist()[-1]
-    partial   = df.partial.tolist()[-1]
-    paid      = df.paid.tolist()[-1]
-    checkedin = df.checkedin.tolist()[-1]
+    new       = last_row.new
+    approved  = last_row.approved
+    partial   = last_row.partial
+    paid      = last_row.paid
+    checkedin = last_row.checkedin
     total     = new + approved + partial + paid + checkedin
     annot     = \
 f'''{total} total regs ({partial + paid + checkedin} paid, out of which {checkedin} checked in).'''
@@ -405,7 +478,7 @@ f'''{total} total regs ({nb_normal} normal, {nb_spons} sponsors, {nb_super} supe
 
 
     # Export
-    plt.savefig(fname       = "./out/Fig1.svg",
+    fig.savefig(fname       = "./out/Fig1.svg",
                 bbox_inches = "tight")
 
 